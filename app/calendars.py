@@ -0,0 +1,447 @@
+"""Holiday calendars shared by every request.
+
+Building a ``holidays.HolidayBase`` re-runs ``_populate`` for every year it
+touches, so instead of creating one per request the app keeps a single
+calendar per (country, province, observed) configuration, built on first
+use by ``get_calendar`` and populated for the years between ``FIRST_YEAR``
+and ``LAST_YEAR``.  Calendars are read through read-only
+``holidays.FrozenHolidays`` snapshots.  Years outside the span are populated
+lazily: those within ``MARGIN_YEARS`` of it are kept, under a lock, in a
+snapshot of their own, and those further out are generated per request.
+
+When ``DATA_PATH`` holds a data file written by ``python holidays.py
+<path>``, it is memory-mapped at import and calendars start from its
+holidays and working-day counts instead of generating them, sharing the
+pages with every other process that maps it.  Their span is then the one
+the data was written for.
+
+With ``SHARED_NAME`` set, the same data is read from the ``shared`` module's
+shared memory instead, published by the first process that imports this
+module.  When the owner publishes a new generation, ``get_calendar`` drops
+the calendars built from the previous one and ``version`` changes.
+"""
+
+import atexit
+import os
+import threading
+import warnings
+from datetime import MAXYEAR, MINYEAR, date
+from functools import lru_cache
+
+import numpy
+
+import holidays
+
+FIRST_YEAR = int(os.environ.get("HOLIDAYS_FIRST_YEAR", 1900))
+LAST_YEAR = int(os.environ.get("HOLIDAYS_LAST_YEAR", 2200))
+DATA_PATH = os.environ.get(
+    "HOLIDAYS_DATA",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "holidays.dat"),
+)
+SHARED_NAME = os.environ.get("HOLIDAYS_SHARED_MEMORY")
+
+# Upper bound on the holidays any supported country has in a year, used to
+# bound how many years an offset of working days can span.
+MAX_HOLIDAYS_PER_YEAR = 25
+
+# Years before and after the span whose holidays are kept once generated.
+MARGIN_YEARS = 100
+
+
+@lru_cache(maxsize=None)
+def weekmask_busdaycal(weekmask):
+    """Return a holiday-free ``numpy.busdaycalendar`` for ``weekmask``."""
+    return numpy.busdaycalendar(weekmask=weekmask)
+
+
+class WorkdayIndex(object):
+    """Cumulative working-day counts for every day of a span of years.
+
+    ``counts[i]`` is the number of working days between the first day of the
+    span and the ``i``-th day after it, so counting the working days of a
+    range is two array reads and offsetting a date is a binary search.
+    Both return ``None`` when the result would fall outside the span.
+    """
+
+    def __init__(
+        self,
+        holiday_ordinals,
+        first_year,
+        last_year,
+        weekmask="1111100",
+        counts=None,
+    ):
+        self.first = date(first_year, 1, 1).toordinal()
+        self.last = date(last_year + 1, 1, 1).toordinal()
+        self.weekmask = weekmask
+        if counts is None:
+            counts = holidays.workday_counts(
+                holiday_ordinals, first_year, last_year, weekmask
+            )
+        self.counts = counts
+
+    def covers(self, start, end):
+        return (
+            self.first <= start.toordinal() <= self.last
+            and self.first <= end.toordinal() <= self.last
+        )
+
+    def count(self, start, end):
+        """Working days in ``[start, end)``, like ``numpy.busday_count``."""
+        start, end = start.toordinal(), end.toordinal()
+        if end < start:
+            # numpy counts the days in (end, start] of reversed ranges
+            start, end = start + 1, end + 1
+        if not (self.first <= start <= self.last and self.first <= end <= self.last):
+            return None
+        counts = self.counts
+        return int(counts[end - self.first]) - int(counts[start - self.first])
+
+    def offset(self, start, increment):
+        """Like ``numpy.busday_offset(start, increment, roll="forward")``."""
+        if not self.covers(start, start):
+            return None
+        counts = self.counts
+        # Working days are numbered from zero; rolling forward lands on the
+        # one numbered by the count of working days before ``start``.
+        target = int(counts[start.toordinal() - self.first]) + increment
+        if not 0 <= target < counts[-1]:
+            return None
+        position = int(numpy.searchsorted(counts, target + 1)) - 1
+        return date.fromordinal(self.first + position)
+
+
+if hasattr(numpy, "bitwise_count"):
+    _popcount = numpy.bitwise_count
+else:
+    _POPCOUNT_TABLE = numpy.array(
+        [bin(byte).count("1") for byte in range(256)], dtype=numpy.uint8
+    )
+
+    def _popcount(words):
+        return _POPCOUNT_TABLE[words.view(numpy.uint8)]
+
+
+# Ranges of up to this many words are counted in Python, which is faster
+# than a round trip through numpy.
+SHORT_WORDS = 8
+
+
+class BitsetIndex(object):
+    """One bit per day of a span of years, packed into 64-bit words.
+
+    ``working`` has a bit set for every working day and ``weekend`` for
+    every day outside ``weekmask``, so counting a range is a popcount of
+    the words it covers less the bits outside it in its two end words.
+    Three centuries take under 14 KB per bitset.  ``count`` returns
+    ``None`` when the range falls outside the span.
+    """
+
+    def __init__(
+        self,
+        holiday_ordinals,
+        first_year,
+        last_year,
+        weekmask="1111100",
+        bits=None,
+    ):
+        self.first = date(first_year, 1, 1).toordinal()
+        self.last = date(last_year + 1, 1, 1).toordinal()
+        self.weekmask = weekmask
+        if bits is None:
+            bits = holidays.workday_bitsets(
+                holiday_ordinals, first_year, last_year, weekmask
+            )
+        self.working, self.weekend = bits
+
+    def covers(self, start, end):
+        return (
+            self.first <= start.toordinal() <= self.last
+            and self.first <= end.toordinal() <= self.last
+        )
+
+    def count(self, start, end, bits=None):
+        """Set bits in ``[start, end)``, like ``numpy.busday_count``.
+
+        Counts working days unless another bitset is passed as ``bits``.
+        """
+        start, end = start.toordinal(), end.toordinal()
+        sign = 1
+        if end < start:
+            # numpy counts the days in (end, start] of reversed ranges
+            start, end, sign = end + 1, start + 1, -1
+        if not (self.first <= start and end <= self.last):
+            return None
+        bits = self.working if bits is None else bits
+        start, end = start - self.first, end - self.first
+        head, tail = start >> 6, end >> 6
+        words = bits[head : tail + 1]
+        if tail - head < SHORT_WORDS:
+            words = words.tolist()
+            total = sum(bin(word).count("1") for word in words)
+            low, high = words[0], words[-1]
+        else:
+            total = int(_popcount(words).sum(dtype=numpy.int64))
+            low, high = int(bits[head]), int(bits[tail])
+        # Bits before ``start`` in its word and from ``end`` on in its word
+        low &= (1 << (start & 63)) - 1
+        high >>= end & 63
+        return sign * (total - bin(low).count("1") - bin(high).count("1"))
+
+    def count_weekend(self, start, end):
+        """Days outside the weekmask in ``[start, end)``."""
+        return self.count(start, end, self.weekend)
+
+
+EPOCH = date(1970, 1, 1).toordinal()
+
+
+def _busdaycal(holiday_ordinals, first_year, last_year, weekmask):
+    # Same signature as the index classes, so HolidayCalendar._index caches it
+    return numpy.busdaycalendar(
+        weekmask=weekmask,
+        holidays=(holiday_ordinals - EPOCH).astype("datetime64[D]"),
+    )
+
+
+class HolidayCalendar(object):
+    def __init__(
+        self,
+        country="CO",
+        first_year=FIRST_YEAR,
+        last_year=LAST_YEAR,
+        data=None,
+        **kwargs
+    ):
+        if data is not None:
+            # Precomputed data holds its own span
+            first_year, last_year = data.first_year, data.last_year
+        self.country = country
+        self.first_year = first_year
+        self.last_year = last_year
+        self.kwargs = kwargs
+        self._lock = threading.Lock()
+        self._workday_indexes = {}
+        self._bitset_indexes = {}
+        self._busdaycals = {}
+        # Holidays of the years generated right before and after the span
+        self._earlier = self._later = holidays.FrozenHolidays({}, years=())
+        if data is not None:
+            self._snapshot = data.holidays
+            self._workday_indexes[data.weekmask] = WorkdayIndex(
+                None, first_year, last_year, data.weekmask, counts=data.counts
+            )
+            self._bitset_indexes[data.weekmask] = BitsetIndex(
+                None,
+                first_year,
+                last_year,
+                data.weekmask,
+                bits=(data.working, data.weekend),
+            )
+        else:
+            self._snapshot = self._build(range(first_year, last_year + 1))
+
+    def _build(self, years):
+        return holidays.CountryHoliday(
+            self.country, years=years, expand=False, **self.kwargs
+        ).freeze()
+
+    def holidays(self, start, end):
+        """Return a snapshot with every year between ``start`` and ``end``."""
+        first_year, last_year = sorted((start.year, end.year))
+        if self.first_year <= first_year and last_year <= self.last_year:
+            return self._snapshot
+        years = range(first_year, last_year + 1)
+        parts = [self._snapshot]
+        if first_year < self.first_year:
+            earlier = range(first_year, min(last_year + 1, self.first_year))
+            if first_year < self.first_year - MARGIN_YEARS:
+                parts.append(self._build(earlier))
+            else:
+                parts.append(self._margin("_earlier", first_year, self.first_year))
+        if last_year > self.last_year:
+            later = range(max(first_year, self.last_year + 1), last_year + 1)
+            if last_year > self.last_year + MARGIN_YEARS:
+                parts.append(self._build(later))
+            else:
+                parts.append(self._margin("_later", self.last_year + 1, last_year + 1))
+        return holidays.FrozenHolidays.combine(parts, years)
+
+    def _margin(self, attribute, first_year, stop_year):
+        # Kept snapshot of the years next to the span, grown by the missing ones
+        margin = getattr(self, attribute)
+        if margin.years.issuperset(range(first_year, stop_year)):
+            return margin
+        with self._lock:
+            margin = getattr(self, attribute)
+            missing = [
+                year
+                for year in range(first_year, stop_year)
+                if year not in margin.years
+            ]
+            if missing:
+                margin = holidays.FrozenHolidays.combine([margin, self._build(missing)])
+                setattr(self, attribute, margin)
+        return margin
+
+    def busdaycal(self, start, end, weekmask="1111100"):
+        """Return a ``numpy.busdaycalendar`` valid between ``start`` and ``end``.
+
+        Inside the precomputed span this is a calendar cached per weekmask;
+        otherwise one is built for the years the range touches.
+        """
+        first_year, last_year = sorted((start.year, end.year))
+        if self.first_year <= first_year and last_year <= self.last_year:
+            return self._index(self._busdaycals, _busdaycal, weekmask)
+        ordinals = self.holidays(start, end).ordinals()
+        # Bounded by ordinals: the day after the range may be past date.max
+        low = numpy.searchsorted(ordinals, date(first_year, 1, 1).toordinal())
+        high = numpy.searchsorted(
+            ordinals, date(last_year, 12, 31).toordinal(), side="right"
+        )
+        return _busdaycal(ordinals[low:high], first_year, last_year, weekmask)
+
+    def offset_busdaycal(self, first, last, low, high, weekmask="1111100"):
+        """Return a busdaycalendar for offsets of between ``low`` and ``high``
+        working days from any date between ``first`` and ``last``.
+
+        The range is only padded in the direction of the offsets, so short
+        offsets within the span use its cached calendar.
+        """
+        working_days_per_year = 52 * weekmask.count("1") - MAX_HOLIDAYS_PER_YEAR
+        working_days_per_year = max(working_days_per_year, 1)
+        start = first.year
+        if low < 0:
+            start = max(start - (-low // working_days_per_year + 1), MINYEAR)
+        # A month past ``last`` for rolling forward onto a working day
+        end = date.fromordinal(min(last.toordinal() + 31, date.max.toordinal())).year
+        if high > 0:
+            end = min(max(end, last.year + high // working_days_per_year + 1), MAXYEAR)
+        return self.busdaycal(date(start, 1, 1), date(end, 12, 31), weekmask)
+
+    def _index(self, indexes, index_class, weekmask):
+        index = indexes.get(weekmask)
+        if index is None:
+            with self._lock:
+                index = indexes.get(weekmask)
+                if index is None:
+                    # Holidays outside the span are ignored or harmless
+                    index = index_class(
+                        self._snapshot.ordinals(),
+                        self.first_year,
+                        self.last_year,
+                        weekmask,
+                    )
+                    indexes[weekmask] = index
+        return index
+
+    def workday_index(self, weekmask="1111100"):
+        """Return the cached ``WorkdayIndex`` of the precomputed span."""
+        return self._index(self._workday_indexes, WorkdayIndex, weekmask)
+
+    def bitset_index(self, weekmask="1111100"):
+        """Return the cached ``BitsetIndex`` of the precomputed span."""
+        return self._index(self._bitset_indexes, BitsetIndex, weekmask)
+
+
+def _load_data(path):
+    # Calendars precomputed in the data file, if there is one
+    try:
+        return holidays.load_data(path)
+    except (IOError, OSError):
+        return {}
+    except ValueError as error:
+        warnings.warn("Ignoring holiday data: %s" % error)
+        return {}
+
+
+def _open_shared(name):
+    # Attach to the shared calendars, publishing them if no process has yet
+    import shared  # multiprocessing.shared_memory needs Python 3.8
+
+    try:
+        return shared.SharedCalendars.attach(name)
+    except FileNotFoundError:
+        pass
+    try:
+        with open(DATA_PATH, "rb") as data_file:
+            data = data_file.read()
+        holidays.parse_data(data, DATA_PATH)
+    except (IOError, OSError, ValueError):
+        data = holidays.encode_data(FIRST_YEAR, LAST_YEAR)
+    try:
+        owner = shared.SharedCalendars.create(name, data)
+    except FileExistsError:
+        return shared.SharedCalendars.attach(name)
+    atexit.register(owner.close)
+    return owner
+
+
+if SHARED_NAME:
+    _shared = _open_shared(SHARED_NAME)
+    _generation, _data = _shared.load()
+else:
+    _shared = None
+    _generation, _data = 0, _load_data(DATA_PATH)
+_calendars = {}
+_calendars_lock = threading.Lock()
+
+
+def version():
+    """Return the generation of the shared calendars, 0 without them."""
+    if _shared is not None and _shared.generation() != _generation:
+        _reload()
+    return _generation
+
+
+def _reload():
+    global _generation, _data
+    with _calendars_lock:
+        if _shared.generation() != _generation:
+            _generation, _data = _shared.load()
+            _calendars.clear()
+
+
+def get_calendar(country="CO", prov=None, observed=True):
+    """Return the shared ``HolidayCalendar`` of a configuration.
+
+    Each configuration is built once per process and data generation.
+    Raises ``KeyError`` for unknown countries and provinces.
+    """
+    cls = holidays.calendar_class(country)
+    if prov is not None and prov not in cls.PROVINCES:
+        raise KeyError("Province %s not available for %s" % (prov, country))
+    if _shared is not None and _shared.generation() != _generation:
+        _reload()
+    # Country names and codes share the calendar of the class they alias
+    key = (cls.__name__, prov, observed)
+    calendar = _calendars.get(key)
+    if calendar is None:
+        with _calendars_lock:
+            calendar = _calendars.get(key)
+            if calendar is None:
+                calendar = HolidayCalendar(
+                    cls.__name__,
+                    data=_data.get(key),
+                    prov=prov,
+                    observed=observed,
+                )
+                _calendars[key] = calendar
+    return calendar
+
+
+def preload(weekmask="1111100"):
+    """Build every calendar and its indexes for ``weekmask``.
+
+    Meant to run at import under gunicorn's ``--preload``, so workers inherit
+    them copy-on-write instead of each building their own after the fork.
+    """
+    weekmask_busdaycal(weekmask)
+    for country in holidays.available_calendars():
+        for prov in [None] + list(holidays.country_class(country).PROVINCES):
+            for observed in (True, False):
+                calendar = get_calendar(country, prov, observed)
+                calendar.workday_index(weekmask)
+                calendar.bitset_index(weekmask)
+                first = date(calendar.first_year, 1, 1)
+                calendar.busdaycal(first, first, weekmask)
@@ -11,12 +11,29 @@
 #  Website: https://github.com/dr-prodigy/python-holidays
 #  License: MIT (see LICENSE file)
 
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, namedtuple
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
 from datetime import date, datetime, timedelta
 from dateutil.easter import easter, EASTER_ORTHODOX
 from dateutil.parser import parse
 from dateutil.relativedelta import relativedelta as rd
 from dateutil.relativedelta import MO, TU, WE, TH, FR, SA, SU
+from functools import lru_cache
+import argparse
+import heapq
+import json
+import mmap
+import numpy as np
+import os
 import six
+import struct
+import sys
 import warnings
 
 
@@ -28,57 +45,220 @@ WEEKEND = (SAT, SUN)
 JAN, FEB, MAR, APR, MAY, JUN, JUL, AUG, SEP, OCT, NOV, DEC = range(1, 13)
 
 
+def easter_dates(years):
+    """Return western Easter Sunday of each of ``years`` as datetime64[D].
+
+    This is the Gregorian computation of ``dateutil.easter.easter`` done on
+    numpy arrays, so it gives the same dates for whole ranges of years.
+    """
+    y = np.asarray(years, dtype=np.int64)
+    g = y % 19
+    c = y // 100
+    h = (c - c // 4 - (8 * c + 13) // 25 + 19 * g + 15) % 30
+    i = h - (h // 28) * (1 - (h // 28) * (29 // (h + 1)) * ((21 - g) // 11))
+    j = (y + y // 4 + i + 2 - c + c // 4) % 7
+    p = i - j
+    d = 1 + (p + 27 + (p + 6) // 40) % 31
+    m = 3 + (p + 26) // 30
+    months = (y - 1970).astype("datetime64[Y]").astype("datetime64[M]") + (m - 1)
+    return months.astype("datetime64[D]") + (d - 1)
+
+
+# Easter Sundays of the years dateutil's western computation is meant for
+EASTER_FIRST_YEAR, EASTER_LAST_YEAR = 1583, 4099
+EASTER_TABLE = easter_dates(np.arange(EASTER_FIRST_YEAR, EASTER_LAST_YEAR + 1))
+_EASTER_DATES = EASTER_TABLE.tolist()
+
+
+def _date_from_timestamp(key):
+    return datetime.utcfromtimestamp(key).date()
+
+
+@lru_cache(maxsize=4096)
+def _date_from_string(key):
+    # ISO 8601 dates and datetimes are the usual keys and are parsed far
+    # faster without dateutil; the results of repeated keys are cached.
+    try:
+        return date.fromisoformat(key)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(key).date()
+    except ValueError:
+        pass
+    try:
+        return parse(key).date()
+    except (ValueError, OverflowError):
+        raise ValueError("Cannot parse date from string '%s'" % key)
+
+
+_DATE_CONVERSIONS = {
+    date: lambda key: key,
+    datetime: datetime.date,
+    int: _date_from_timestamp,
+    float: _date_from_timestamp,
+    str: _date_from_string,
+}
+
+
+def _to_date(key):
+    """Convert a date, datetime, timestamp or date string to a date."""
+    conversion = _DATE_CONVERSIONS.get(type(key))
+    if conversion is not None:
+        return conversion(key)
+    # Subclasses of the types above
+    if isinstance(key, datetime):
+        return key.date()
+    elif isinstance(key, date):
+        return key
+    elif isinstance(key, int) or isinstance(key, float):
+        return _date_from_timestamp(key)
+    elif isinstance(key, six.string_types):
+        return _date_from_string(key)
+    raise TypeError("Cannot convert type '%s' to date." % type(key))
+
+
+def _easter(year):
+    if EASTER_FIRST_YEAR <= year <= EASTER_LAST_YEAR:
+        return _EASTER_DATES[year - EASTER_FIRST_YEAR]
+    return easter(year)
+
+
+def _slice_bounds(key):
+    # Start and stop dates and the step in days of a slice of holidays
+    if not key.start or not key.stop:
+        raise ValueError("Both start and stop must be given.")
+
+    start = _to_date(key.start)
+    stop = _to_date(key.stop)
+
+    if key.step is None:
+        step = 1
+    elif isinstance(key.step, timedelta):
+        step = key.step.days
+    elif isinstance(key.step, int):
+        step = key.step
+    else:
+        raise TypeError("Cannot convert type '%s' to int." % type(key.step))
+
+    if step == 0:
+        raise ValueError("Step value must not be zero.")
+
+    date_diff = stop - start
+    if date_diff.days < 0 <= step or date_diff.days >= 0 > step:
+        step *= -1
+    return start, stop, step
+
+
+def _dates_in_slice(ordinals, start, stop, step):
+    # Bisect the sorted holiday ordinals instead of probing every day in the
+    # range, so the cost depends on the number of holidays returned.
+    start, stop = start.toordinal(), stop.toordinal()
+    if step > 0:
+        in_range = ordinals[bisect_left(ordinals, start) : bisect_left(ordinals, stop)]
+    else:
+        in_range = ordinals[
+            bisect_right(ordinals, stop) : bisect_right(ordinals, start)
+        ][::-1]
+    if step not in (1, -1):
+        in_range = [o for o in in_range if (o - start) % step == 0]
+    return [date.fromordinal(o) for o in in_range]
+
+
+@lru_cache(maxsize=4096)
+def _split_names(value):
+    # Holidays named in ``value``, a name or ", " joined names.  Cached, so
+    # the names of the values a calendar stores are only split once.
+    return tuple(name for name in value.split(", ") if name)
+
+
+def _add_names(existing, value):
+    # Holidays ``existing`` once the names of ``value`` are added, new names
+    # first; None if it has them all.
+    names = _split_names(existing)
+    value_names = _split_names(value)
+    added = [name for name in value_names if name not in names]
+    if not added:
+        return None
+    if len(added) < len(value_names):
+        value = ", ".join(added)
+    return "%s, %s" % (value, existing)
+
+
+YearCacheInfo = namedtuple(
+    "YearCacheInfo", ["populations", "evictions", "max_years", "years"]
+)
+
+
 class HolidayBase(dict):
     PROVINCES = []
-
-    def __init__(self, years=[], expand=True, observed=True, prov=None, state=None):
+    max_years = None
+    _ordinals = None
+    _populations = 0
+    _evictions = 0
+
+    def __init__(
+        self,
+        years=[],
+        expand=True,
+        observed=True,
+        prov=None,
+        state=None,
+        max_years=None,
+    ):
+        self.years = set()
+        self._year_order = OrderedDict()
         self.observed = observed
         self.expand = expand
+        # With max_years, only that many years stay populated; the least
+        # recently used ones are evicted when expand adds new years.
+        self.max_years = max_years
         if isinstance(years, int):
             years = [years]
-        self.years = set(years)
         if not getattr(self, "prov", False):
             self.prov = prov
         self.state = state
-        for year in list(self.years):
-            self._populate(year)
+        self._expand(sorted(set(years)))
 
     def __setattr__(self, key, value):
-        if key == "observed" and len(self) > 0:
+        if (
+            key == "observed"
+            and "observed" in self.__dict__
+            and bool(value) != bool(self.observed)
+        ):
+            # The holidays of the mode being left are set aside and those of
+            # the other mode restored, so switching back and forth only
+            # populates the years a mode lacks.
+            variants = self.__dict__.setdefault("_observed_variants", {})
+            variants[bool(self.observed)] = (
+                dict(self),
+                self.years,
+                self._year_order,
+                self._ordinals,
+            )
             dict.__setattr__(self, key, value)
-            if value is True:
-                # Add (Observed) dates
-                years = list(self.years)
-                self.years = set()
-                self.clear()
-                for year in years:
-                    self._populate(year)
-            else:
-                # Remove (Observed) dates
-                for k, v in list(self.items()):
-                    if v.find("Observed") >= 0:
-                        del self[k]
+            years = self.years
+            (
+                restored,
+                self.years,
+                self._year_order,
+                self._ordinals,
+            ) = variants.pop(bool(value), ({}, set(), OrderedDict(), None))
+            dict.clear(self)
+            dict.update(self, restored)
+            missing = years - self.years
+            if missing:
+                self._expand(sorted(missing))
         else:
             return dict.__setattr__(self, key, value)
 
     def __keytransform__(self, key):
-        if isinstance(key, datetime):
-            key = key.date()
-        elif isinstance(key, date):
-            key = key
-        elif isinstance(key, int) or isinstance(key, float):
-            key = datetime.utcfromtimestamp(key).date()
-        elif isinstance(key, six.string_types):
-            try:
-                key = parse(key).date()
-            except (ValueError, OverflowError):
-                raise ValueError("Cannot parse date from string '%s'" % key)
-        else:
-            raise TypeError("Cannot convert type '%s' to date." % type(key))
-
+        if type(key) is not date:
+            key = _DATE_CONVERSIONS.get(type(key), _to_date)(key)
         if self.expand and key.year not in self.years:
-            self.years.add(key.year)
-            self._populate(key.year)
+            self._expand([key.year])
+        elif self.max_years is not None and key.year in self._year_order:
+            self._year_order.move_to_end(key.year)
         return key
 
     def __contains__(self, key):
@@ -86,47 +266,85 @@ class HolidayBase(dict):
 
     def __getitem__(self, key):
         if isinstance(key, slice):
-            if not key.start or not key.stop:
-                raise ValueError("Both start and stop must be given.")
-
-            start = self.__keytransform__(key.start)
-            stop = self.__keytransform__(key.stop)
-
-            if key.step is None:
-                step = 1
-            elif isinstance(key.step, timedelta):
-                step = key.step.days
-            elif isinstance(key.step, int):
-                step = key.step
-            else:
-                raise TypeError("Cannot convert type '%s' to int." % type(key.step))
-
-            if step == 0:
-                raise ValueError("Step value must not be zero.")
-
-            date_diff = stop - start
-            if date_diff.days < 0 <= step or date_diff.days >= 0 > step:
-                step *= -1
-
-            days_in_range = []
-            for delta_days in range(0, date_diff.days, step):
-                day = start + timedelta(days=delta_days)
-                try:
-                    dict.__getitem__(self, day)
-                    # days_in_range.append((day, dict.__getitem__(self, day)))
-                    days_in_range.append(day)
-                except (KeyError):
-                    pass
-            return days_in_range
+            start, stop, step = _slice_bounds(key)
+            if self.expand:
+                # Populate every year in the range in one pass, not only
+                # the years of start and stop
+                first_year, last_year = sorted((start.year, stop.year))
+                self._expand(range(first_year, last_year + 1))
+            days = _dates_in_slice(self._ordinal_index(), start, stop, step)
+            if self.max_years is not None:
+                # The slice may have populated more than max_years
+                self._evict()
+            return days
         return dict.__getitem__(self, self.__keytransform__(key))
 
     def __setitem__(self, key, value):
-        if key in self:
-            if self.get(key).find(value) < 0 and value.find(self.get(key)) < 0:
-                value = "%s, %s" % (value, self.get(key))
-            else:
-                value = self.get(key)
-        return dict.__setitem__(self, self.__keytransform__(key), value)
+        key = self.__keytransform__(key)
+        if dict.__contains__(self, key):
+            existing = dict.__getitem__(self, key)
+            # Values that aren't names, like the None of setdefault(day),
+            # replace the date's holidays and are replaced as they are
+            if isinstance(value, six.string_types) and isinstance(
+                existing, six.string_types
+            ):
+                value = _add_names(existing, value)
+                if value is None:
+                    return
+        elif self._ordinals is not None:
+            self._ordinals = None
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        key = self.__keytransform__(key)
+        if self._ordinals is not None:
+            self._ordinals = None
+        dict.__delitem__(self, key)
+
+    def _expand(self, years):
+        # Populate the years in ``years`` that are not populated yet
+        missing = [year for year in years if year not in self.years]
+        if missing:
+            self.years.update(missing)
+            self._populate_many(missing)
+            self._populations += len(missing)
+        if self.max_years is not None:
+            for year in years:
+                self._year_order[year] = None
+                self._year_order.move_to_end(year)
+            self._evict(keep=len(years))
+
+    def _evict(self, keep=0):
+        # Drop the least recently used years beyond max_years, never fewer
+        # than the ``keep`` most recent ones.
+        excess = len(self._year_order) - max(self.max_years, keep)
+        ordinals = self._ordinal_index()
+        for _ in range(excess):
+            year = self._year_order.popitem(last=False)[0]
+            self.years.discard(year)
+            lo = bisect_left(ordinals, date(year, 1, 1).toordinal())
+            hi = bisect_right(ordinals, date(year, 12, 31).toordinal())
+            for ordinal in ordinals[lo:hi]:
+                day = date.fromordinal(ordinal)
+                dict.__delitem__(self, day)
+            del ordinals[lo:hi]
+            self._evictions += 1
+
+    def cache_info(self):
+        """Return how many years were populated and evicted, the max_years
+        limit and the number of years currently populated."""
+        return YearCacheInfo(
+            self._populations, self._evictions, self.max_years, len(self.years)
+        )
+
+    def _ordinal_index(self):
+        # Sorted ordinals of all holiday dates, rebuilt lazily after the
+        # set of dates changes.
+        ordinals = self._ordinals
+        if ordinals is None:
+            ordinals = sorted(day.toordinal() for day in self)
+            self._ordinals = ordinals
+        return ordinals
 
     def update(self, *args):
         args = list(args)
@@ -143,22 +361,59 @@ class HolidayBase(dict):
     def append(self, *args):
         return self.update(*args)
 
+    def __ior__(self, other):
+        # dict's in-place union would bypass __setitem__
+        self.update(dict(other))
+        return self
+
     def get(self, key, default=None):
         return dict.get(self, self.__keytransform__(key), default)
 
     def get_list(self, key):
-        return [h for h in self.get(key, "").split(", ") if h]
+        value = dict.get(self, self.__keytransform__(key), "")
+        return list(_split_names(value)) if isinstance(value, six.string_types) else []
 
     def pop(self, key, default=None):
+        key = self.__keytransform__(key)
+        if self._ordinals is not None:
+            self._ordinals = None
         if default is None:
-            return dict.pop(self, self.__keytransform__(key))
-        return dict.pop(self, self.__keytransform__(key), default)
+            return dict.pop(self, key)
+        return dict.pop(self, key, default)
+
+    def popitem(self):
+        self._ordinals = None
+        return dict.popitem(self)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self.get(key)
+
+    def clear(self):
+        self._ordinals = None
+        dict.clear(self)
+        self.__dict__.pop("_observed_variants", None)
+
+    def __copy__(self):
+        copied = type(self).__new__(type(self))
+        dict.update(copied, self)
+        copied.__dict__.update(self.__dict__)
+        copied.years = set(self.years)
+        copied._year_order = OrderedDict(self._year_order)
+        copied._ordinals = None
+        copied.__dict__.pop("_observed_variants", None)
+        return copied
+
+    def _public_dict(self):
+        # Instance attributes without private caches such as the ordinal index
+        return dict((k, v) for k, v in self.__dict__.items() if not k.startswith("_"))
 
     def __eq__(self, other):
-        return dict.__eq__(self, other) and self.__dict__ == other.__dict__
+        return dict.__eq__(self, other) and self._public_dict() == other._public_dict()
 
     def __ne__(self, other):
-        return dict.__ne__(self, other) or self.__dict__ != other.__dict__
+        return not self.__eq__(other)
 
     def __add__(self, other):
         if isinstance(other, int) and other == 0:
@@ -183,6 +438,7 @@ class HolidayBase(dict):
             p2 = other.prov if isinstance(other.prov, list) else [other.prov]
             prov = p1 + p2
         return HolidaySum(
+            holidays=_components(self) + _components(other),
             years=(self.years | other.years),
             expand=(self.expand or other.expand),
             observed=(self.observed or other.observed),
@@ -193,41 +449,557 @@ class HolidayBase(dict):
     def __radd__(self, other):
         return self.__add__(other)
 
+    def freeze(self):
+        """Return a read-only ``FrozenHolidays`` snapshot of this calendar."""
+        return FrozenHolidays(self)
+
     def _populate(self, year):
         pass
 
+    def _populate_many(self, years):
+        for year in years:
+            self._populate(year)
 
-def createHolidaySum(h1, h2):
-    class HolidaySum(HolidayBase):
-        def __init__(self, country, **kwargs):
-            self.country = country
-            self.holidays = []
-            if getattr(h1, "holidays", False):
-                for h in h1.holidays:
-                    self.holidays.append(h)
-            else:
-                self.holidays.append(h1)
-            if getattr(h2, "holidays", False):
-                for h in h2.holidays:
-                    self.holidays.append(h)
-            else:
-                self.holidays.append(h2)
-            HolidayBase.__init__(self, **kwargs)
 
-        def _populate(self, year):
-            for h in self.holidays[::-1]:
-                h._populate(year)
-                self.update(h)
+class FrozenHolidays(Mapping):
+    """Read-only snapshot of the holidays of a ``HolidayBase``.
+
+    Unlike ``HolidayBase`` it never populates years or changes in any other
+    way once built, so one instance can be shared between threads without
+    locking. It is hashable and picklable, supports the same lookups and
+    slices, and only knows the holidays of the years it was built with.
+
+    Holidays are kept compactly: a sorted ``array`` of date ordinals, a
+    parallel ``array`` of indexes into a tuple of the distinct names.
+    """
+
+    __slots__ = (
+        "_ordinals",
+        "_name_ids",
+        "_names",
+        "_name_lists",
+        "_hash",
+        "years",
+        "country",
+        "prov",
+        "state",
+        "observed",
+    )
+
+    def __init__(
+        self, holidays, years=None, country=None, prov=None, state=None, observed=None
+    ):
+        if years is None:
+            years = getattr(holidays, "years", ())
+        if observed is None:
+            observed = getattr(holidays, "observed", True)
+        items = sorted(holidays.items())
+        name_ids = {}
+        for _, name in items:
+            name_ids.setdefault(name, len(name_ids))
+        self._set_state(
+            array("i", [day.toordinal() for day, _ in items]),
+            array("I", [name_ids[name] for _, name in items]),
+            tuple(name_ids),
+            years,
+            country or getattr(holidays, "country", None),
+            prov or getattr(holidays, "prov", None),
+            state or getattr(holidays, "state", None),
+            observed,
+        )
 
-    return HolidaySum
+    @classmethod
+    def _from_arrays(
+        cls, ordinals, name_ids, names, years, country, prov, state, observed
+    ):
+        frozen = cls.__new__(cls)
+        frozen._set_state(
+            ordinals, name_ids, names, years, country, prov, state, observed
+        )
+        return frozen
+
+    @classmethod
+    def combine(cls, parts, years=None):
+        """Return one snapshot with the holidays of ``parts`` in ``years``.
+
+        Each part holds consecutive years that no other part holds; all
+        their years are kept when ``years`` is None.
+        """
+        spans = []
+        for part in parts:
+            part_years = part.years if years is None else part.years.intersection(years)
+            if part_years:
+                spans.append((min(part_years), max(part_years), part_years, part))
+        spans.sort(key=lambda span: span[0])
+        ordinals, name_ids, names, all_years = [], [], [], set()
+        for first_year, last_year, part_years, part in spans:
+            low = bisect_left(part._ordinals, date(first_year, 1, 1).toordinal())
+            high = bisect_right(part._ordinals, date(last_year, 12, 31).toordinal())
+            ordinals.append(np.frombuffer(part._ordinals, dtype=np.intc)[low:high])
+            part_ids = np.frombuffer(part._name_ids, dtype=np.uintc)[low:high]
+            name_ids.append(part_ids + np.uintc(len(names)))
+            names.extend(part._names)
+            all_years.update(part_years)
+        model = spans[0][3] if spans else parts[0]
+        return cls._from_arrays(
+            array("i", np.concatenate(ordinals or [[]]).astype(np.intc).tobytes()),
+            array("I", np.concatenate(name_ids or [[]]).astype(np.uintc).tobytes()),
+            names,
+            all_years,
+            model.country,
+            model.prov,
+            model.state,
+            model.observed,
+        )
 
+    def _set_state(
+        self, ordinals, name_ids, names, years, country, prov, state, observed
+    ):
+        for name, value in (
+            ("_ordinals", ordinals),
+            ("_name_ids", name_ids),
+            ("_names", tuple(names)),
+            (
+                "_name_lists",
+                tuple(
+                    _split_names(name) if isinstance(name, six.string_types) else ()
+                    for name in names
+                ),
+            ),
+            ("_hash", None),
+            ("years", frozenset(years)),
+            ("country", country),
+            ("prov", prov),
+            ("state", state),
+            ("observed", observed),
+        ):
+            object.__setattr__(self, name, value)
 
-def CountryHoliday(country, prov=None, state=None):
-    try:
-        country_holiday = globals()[country](prov=prov, state=state)
-    except (KeyError):
+    def __setattr__(self, key, value):
+        raise AttributeError("FrozenHolidays is read-only")
+
+    def _position(self, key):
+        # Index of the holiday on ``key`` in the arrays, or -1
+        ordinal = _to_date(key).toordinal()
+        ordinals = self._ordinals
+        i = bisect_left(ordinals, ordinal)
+        if i < len(ordinals) and ordinals[i] == ordinal:
+            return i
+        return -1
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = _slice_bounds(key)
+            return _dates_in_slice(self._ordinals, start, stop, step)
+        i = self._position(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._names[self._name_ids[i]]
+
+    def __contains__(self, key):
+        return self._position(key) >= 0
+
+    def __iter__(self):
+        return (date.fromordinal(ordinal) for ordinal in self._ordinals)
+
+    def __len__(self):
+        return len(self._ordinals)
+
+    def get(self, key, default=None):
+        i = self._position(key)
+        if i < 0:
+            return default
+        return self._names[self._name_ids[i]]
+
+    def get_list(self, key):
+        i = self._position(key)
+        if i < 0:
+            return []
+        return list(self._name_lists[self._name_ids[i]])
+
+    def ordinals(self):
+        """Return the sorted holiday date ordinals as a read-only numpy array,
+        without copying them."""
+        ordinals = np.frombuffer(self._ordinals, dtype=np.intc)
+        ordinals.flags.writeable = False
+        return ordinals
+
+    def _state(self):
+        country, prov = self.country, self.prov
+        return (
+            tuple(country) if isinstance(country, list) else country,
+            tuple(prov) if isinstance(prov, list) else prov,
+            self.state,
+            self.observed,
+            self.years,
+            self._ordinals.tobytes(),
+            tuple(self._names[i] for i in self._name_ids),
+        )
+
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hash(self._state()))
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, FrozenHolidays):
+            return NotImplemented
+        return self._state() == other._state()
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __reduce__(self):
+        # Arrays mapped from a data file are memoryviews, which don't pickle
+        return (
+            FrozenHolidays._from_arrays,
+            (
+                array("i", self._ordinals),
+                array("I", self._name_ids),
+                self._names,
+                self.years,
+                self.country,
+                self.prov,
+                self.state,
+                self.observed,
+            ),
+        )
+
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, dict(self.items()))
+
+
+class HolidaySum(HolidayBase):
+    """Union of the holidays of several calendars.
+
+    Years are populated by merging the sorted holidays of the components,
+    populating the years they are missing first.
+    """
+
+    def __init__(self, country, holidays=(), **kwargs):
+        self.country = country
+        self.holidays = list(holidays)
+        HolidayBase.__init__(self, **kwargs)
+
+    def _populate(self, year):
+        self._populate_many([year])
+
+    def _populate_many(self, years):
+        if not years:
+            return
+        for h in self.holidays:
+            h._expand(years)
+        years = set(years)
+        first = date(min(years), 1, 1).toordinal()
+        last = date(max(years), 12, 31).toordinal()
+        # Later components go first, so names merge in the same order as
+        # updating from each component in reverse.
+        components = self.holidays[::-1]
+        ranges = []
+        for rank, h in enumerate(components):
+            ordinals = h._ordinal_index()
+            ranges.append(
+                [
+                    (ordinal, rank)
+                    for ordinal in ordinals[
+                        bisect_left(ordinals, first) : bisect_right(ordinals, last)
+                    ]
+                ]
+            )
+        for ordinal, rank in heapq.merge(*ranges):
+            day = date.fromordinal(ordinal)
+            if day.year in years:
+                self[day] = dict.__getitem__(components[rank], day)
+
+
+_holiday_sum_classes = {}
+
+
+def _components(h):
+    return list(getattr(h, "holidays", None) or [h])
+
+
+def createHolidaySum(h1, h2):
+    """Return the HolidaySum class for adding ``h1`` and ``h2``, created once
+    per combination of component classes."""
+    key = tuple(type(h) for h in _components(h1) + _components(h2))
+    cls = _holiday_sum_classes.get(key)
+    if cls is None:
+        cls = _holiday_sum_classes.setdefault(
+            key, type("HolidaySum", (HolidaySum,), {})
+        )
+    return cls
+
+
+def CountryHoliday(
+    country,
+    years=[],
+    prov=None,
+    state=None,
+    expand=True,
+    observed=True,
+    max_years=None,
+):
+    return country_class(country)(
+        years=years,
+        prov=prov,
+        state=state,
+        expand=expand,
+        observed=observed,
+        max_years=max_years,
+    )
+
+
+@lru_cache(maxsize=None)
+def country_class(country):
+    """Return the HolidayBase subclass for a country name or code."""
+    cls = globals().get(country)
+    if (
+        not isinstance(cls, type)
+        or not issubclass(cls, HolidayBase)
+        or issubclass(cls, HolidaySum)
+        or cls is HolidayBase
+    ):
         raise KeyError("Country %s not available" % country)
-    return country_holiday
+    return cls
+
+
+# Holiday data written by ``encode_data`` and read by ``parse_data``, in a
+# file (``write_data`` and ``load_data``) or a shared memory block: a header
+# (magic, format version, directory length), a JSON directory and 8-byte
+# aligned native-endian arrays.  Each calendar of the directory has int32
+# holiday ordinals, uint32 ids into its list of names, the int32 working-day
+# counts of ``workday_counts`` and the two uint64 bitsets of
+# ``workday_bitsets``.
+DATA_MAGIC = b"HOLIDAYS"
+DATA_VERSION = 2
+_DATA_HEADER = struct.Struct("<8sII")
+_DATA_ARRAYS = (
+    ("ordinals", "i"),
+    ("name_ids", "I"),
+    ("counts", "i"),
+    ("working", "Q"),
+    ("weekend", "Q"),
+)
+
+HolidayData = namedtuple(
+    "HolidayData", "holidays counts working weekend first_year last_year weekmask"
+)
+
+
+def _align(offset):
+    return -(-offset // 8) * 8
+
+
+def available_countries():
+    """Return the names and codes ``CountryHoliday`` accepts."""
+    countries = []
+    for name in sorted(globals()):
+        try:
+            country_class(name)
+        except KeyError:
+            continue
+        countries.append(name)
+    return countries
+
+
+def calendar_class(country):
+    """Return the class defining the holidays of a country name or code.
+
+    Aliases, like country codes, subclass it without changing its holidays,
+    so they share its calendar.
+    """
+    cls = country_class(country)
+    while "_populate" not in vars(cls) and cls.__base__ is not HolidayBase:
+        cls = cls.__base__
+    return cls
+
+
+def available_calendars():
+    """Return the name of each distinct calendar ``CountryHoliday`` builds."""
+    return sorted(
+        set(calendar_class(country).__name__ for country in available_countries())
+    )
+
+
+def _working_days(ordinals, first_year, last_year, weekmask):
+    # Boolean working days and days outside the weekmask of a span of years
+    first = date(first_year, 1, 1).toordinal()
+    last = date(last_year + 1, 1, 1).toordinal()
+    days = np.arange(first, last)
+    weekend = np.array([day == "0" for day in weekmask])[(days + 6) % 7]
+    working = ~weekend
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    working[ordinals[(first <= ordinals) & (ordinals < last)] - first] = False
+    return working, weekend
+
+
+def workday_counts(ordinals, first_year, last_year, weekmask="1111100"):
+    """Return the cumulative working days of a span of years.
+
+    Element ``i`` is the number of working days among the first ``i`` days
+    of the span, given the ``ordinals`` of its holidays.
+    """
+    working, _ = _working_days(ordinals, first_year, last_year, weekmask)
+    counts = np.zeros(len(working) + 1, dtype=np.int32)
+    np.cumsum(working, out=counts[1:])
+    return counts
+
+
+def _pack_days(days):
+    # Little-endian 64-bit words, one bit per day; a trailing zero word lets
+    # ranges end on the last day of the span.
+    packed = np.packbits(days, bitorder="little")
+    padding = np.zeros(-len(packed) % 8 + 8, dtype=np.uint8)
+    return np.concatenate([packed, padding]).view("<u8")
+
+
+def workday_bitsets(ordinals, first_year, last_year, weekmask="1111100"):
+    """Return bitsets of the working days and of the days outside the
+    weekmask of a span of years, bit ``i`` standing for its ``i``-th day."""
+    working, weekend = _working_days(ordinals, first_year, last_year, weekmask)
+    return _pack_days(working), _pack_days(weekend)
+
+
+def encode_data(first_year, last_year, countries=None, weekmask="1111100"):
+    """Return the holidays of every province and observed mode of
+    ``countries`` (all of them by default) between two years, encoded.
+
+    Each calendar is written once, under the name of its ``calendar_class``.
+    """
+    directory = {
+        "byteorder": sys.byteorder,
+        "first_year": first_year,
+        "last_year": last_year,
+        "weekmask": weekmask,
+        "calendars": [],
+    }
+    arrays = []
+    offset = 0
+    years = range(first_year, last_year + 1)
+    if countries is None:
+        countries = available_calendars()
+    else:
+        countries = sorted(set(calendar_class(c).__name__ for c in countries))
+    for country in countries:
+        for prov in [None] + list(country_class(country).PROVINCES):
+            for observed in (True, False):
+                frozen = CountryHoliday(
+                    country, years=years, prov=prov, expand=False, observed=observed
+                ).freeze()
+                calendar = {
+                    "country": country,
+                    "prov": prov,
+                    "observed": observed,
+                    "names": list(frozen._names),
+                }
+                working, weekend = workday_bitsets(
+                    frozen._ordinals, first_year, last_year, weekmask
+                )
+                for key, values in (
+                    ("ordinals", np.asarray(frozen._ordinals, dtype=np.int32)),
+                    ("name_ids", np.asarray(frozen._name_ids, dtype=np.uint32)),
+                    (
+                        "counts",
+                        workday_counts(
+                            frozen._ordinals, first_year, last_year, weekmask
+                        ),
+                    ),
+                    ("working", working),
+                    ("weekend", weekend),
+                ):
+                    calendar[key] = [offset, len(values)]
+                    arrays.append((offset, values))
+                    offset = _align(offset + values.nbytes)
+                directory["calendars"].append(calendar)
+
+    encoded = json.dumps(directory).encode("utf-8")
+    base = _align(_DATA_HEADER.size + len(encoded))
+    data = bytearray(base + offset)
+    _DATA_HEADER.pack_into(data, 0, DATA_MAGIC, DATA_VERSION, len(encoded))
+    data[_DATA_HEADER.size : _DATA_HEADER.size + len(encoded)] = encoded
+    for offset, values in arrays:
+        data[base + offset : base + offset + values.nbytes] = values.tobytes()
+    return data
+
+
+def parse_data(buffer, source="buffer"):
+    """Read data from ``encode_data`` without copying its arrays.
+
+    Returns a ``HolidayData`` per ``(country, prov, observed)`` whose
+    holidays, counts and bitsets are views of ``buffer``.  Raises
+    ``ValueError`` for data of another format version or byte order, and
+    for truncated data.
+    """
+    if len(buffer) < _DATA_HEADER.size:
+        raise ValueError("%s is truncated" % source)
+    magic, version, size = _DATA_HEADER.unpack_from(buffer)
+    if magic != DATA_MAGIC or version != DATA_VERSION:
+        raise ValueError("%s is not version %d holiday data" % (source, DATA_VERSION))
+    start = _DATA_HEADER.size
+    base = _align(start + size)
+    if base > len(buffer):
+        raise ValueError("%s is truncated" % source)
+    view = memoryview(buffer)
+    directory = json.loads(bytes(view[start : start + size]).decode("utf-8"))
+    if directory["byteorder"] != sys.byteorder:
+        raise ValueError(
+            "%s was written on a %s-endian machine" % (source, directory["byteorder"])
+        )
+    first_year, last_year = directory["first_year"], directory["last_year"]
+    years = range(first_year, last_year + 1)
+    loaded = {}
+    for calendar in directory["calendars"]:
+        arrays = {}
+        for key, typecode in _DATA_ARRAYS:
+            offset, length = calendar[key]
+            nbytes = length * struct.calcsize(typecode)
+            if offset < 0 or length < 0 or base + offset + nbytes > len(buffer):
+                raise ValueError("%s is truncated" % source)
+            arrays[key] = view[base + offset : base + offset + nbytes].cast(typecode)
+        country, prov = calendar["country"], calendar["prov"]
+        observed = calendar["observed"]
+        loaded[country, prov, observed] = HolidayData(
+            FrozenHolidays._from_arrays(
+                arrays["ordinals"],
+                arrays["name_ids"],
+                calendar["names"],
+                years,
+                country,
+                prov,
+                None,
+                observed,
+            ),
+            np.frombuffer(arrays["counts"], dtype=np.intc),
+            np.frombuffer(arrays["working"], dtype=np.uint64),
+            np.frombuffer(arrays["weekend"], dtype=np.uint64),
+            first_year,
+            last_year,
+            directory["weekmask"],
+        )
+    return loaded
+
+
+def write_data(path, first_year, last_year, countries=None, weekmask="1111100"):
+    """Write ``encode_data`` to ``path``.
+
+    The file is written next to ``path`` and renamed over it, so processes
+    that mapped the previous one keep reading it unchanged.
+    """
+    data = encode_data(first_year, last_year, countries, weekmask)
+    temporary = "%s.%d.tmp" % (path, os.getpid())
+    with open(temporary, "wb") as output:
+        output.write(data)
+    os.replace(temporary, path)
+
+
+def load_data(path):
+    """Memory-map a file written by ``write_data`` and ``parse_data`` it, so
+    processes mapping the same file share its pages."""
+    with open(path, "rb") as data:
+        mapped = mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ)
+    return parse_data(mapped, path)
 
 
 class Colombia(HolidayBase):
@@ -326,19 +1098,20 @@ class Colombia(HolidayBase):
             self[date(year, NOV, 11) + rd(weekday=MO)] = name + "(Observed)"
 
         # Holidays based on Easter
+        easter_sunday = _easter(year)
 
         # Maundy Thursday
-        self[easter(year) + rd(weekday=TH(-1))] = "Jueves Santo [Maundy Thursday]"
+        self[easter_sunday + rd(weekday=TH(-1))] = "Jueves Santo [Maundy Thursday]"
 
         # Good Friday
-        self[easter(year) + rd(weekday=FR(-1))] = "Viernes Santo [Good Friday]"
+        self[easter_sunday + rd(weekday=FR(-1))] = "Viernes Santo [Good Friday]"
 
         # Holidays based on Easter but are observed the following monday
         # (unless they occur on a monday)
 
         # Ascension of Jesus
         name = "Ascensión del señor [Ascension of Jesus]"
-        hdate = easter(year) + rd(days=+39)
+        hdate = easter_sunday + rd(days=+39)
         if hdate.weekday() == MON or not self.observed:
             self[hdate] = name
         else:
@@ -346,7 +1119,7 @@ class Colombia(HolidayBase):
 
         # Corpus Christi
         name = "Corpus Christi [Corpus Christi]"
-        hdate = easter(year) + rd(days=+60)
+        hdate = easter_sunday + rd(days=+60)
         if hdate.weekday() == MON or not self.observed:
             self[hdate] = name
         else:
@@ -354,12 +1127,139 @@ class Colombia(HolidayBase):
 
         # Sacred Heart
         name = "Sagrado Corazón [Sacred Heart]"
-        hdate = easter(year) + rd(days=+68)
+        hdate = easter_sunday + rd(days=+68)
         if hdate.weekday() == MON or not self.observed:
             self[hdate] = name
         else:
             self[hdate + rd(weekday=MO)] = name + "(Observed)"
 
+    def _populate_many(self, years):
+        if len(years) < 3:
+            # Cheaper than setting up the arrays for a year or two
+            return HolidayBase._populate_many(self, years)
+        days, names = colombia_holidays(years, observed=self.observed)
+        for day, name in zip(days.tolist(), names):
+            if dict.__contains__(self, day):
+                self[day] = name
+            else:
+                dict.__setitem__(self, day, name)
+        self._ordinals = None
+
+
+# Colombia's holidays in the order Colombia._populate adds them. Fixed
+# holidays are always on their date; weekday ones are skipped on weekends
+# and movable ones moved to the next Monday when observed. Easter based
+# ones are given as days after Easter Sunday.
+_COLOMBIA_RULES = [
+    ("weekday", (JAN, 1), "Año Nuevo [New Year's Day]"),
+    ("fixed", (MAY, 1), "Día del Trabajo [Labour Day]"),
+    ("weekday", (JUL, 20), "Día de la Independencia [Independence Day]"),
+    ("fixed", (AUG, 7), "Batalla de Boyacá [Battle of Boyacá]"),
+    (
+        "weekday",
+        (DEC, 8),
+        "La Inmaculada Concepción [Immaculate Conception]",
+    ),
+    ("fixed", (DEC, 25), "Navidad [Christmas]"),
+    ("movable", (JAN, 6), "Día de los Reyes Magos [Epiphany]"),
+    ("movable", (MAR, 19), "Día de San José [Saint Joseph's Day]"),
+    (
+        "movable",
+        (JUN, 29),
+        "San Pedro y San Pablo [Saint Peter and Saint Paul]",
+    ),
+    ("movable", (AUG, 15), "La Asunción [Assumption of Mary]"),
+    ("movable", (OCT, 12), "Descubrimiento de América [Discovery of America]"),
+    ("movable", (NOV, 1), "Dia de Todos los Santos [All Saint's Day]"),
+    (
+        "movable",
+        (NOV, 11),
+        "Independencia de Cartagena [Independence of Cartagena]",
+    ),
+    ("easter", -3, "Jueves Santo [Maundy Thursday]"),
+    ("easter", -2, "Viernes Santo [Good Friday]"),
+    ("easter-movable", 39, "Ascensión del señor [Ascension of Jesus]"),
+    ("easter-movable", 60, "Corpus Christi [Corpus Christi]"),
+    ("easter-movable", 68, "Sagrado Corazón [Sacred Heart]"),
+]
+
+
+def _weekdays(days):
+    # datetime64[D] counts days from 1970-01-01, a Thursday
+    return (days.astype(np.int64) + THU) % 7
+
+
+def colombia_holidays(years, observed=True):
+    """Return Colombia's holidays for ``years`` as sorted numpy arrays.
+
+    Gives a ``datetime64[D]`` array of dates and a list with the name of
+    each date, the same holidays and names ``Colombia._populate`` adds year
+    by year, computed for all the years at once.
+    """
+    years = np.array(sorted(set(years)), dtype=np.int64)
+    months = (years - 1970).astype("datetime64[Y]").astype("datetime64[M]")
+    if len(years) and EASTER_FIRST_YEAR <= years[0] <= years[-1] <= EASTER_LAST_YEAR:
+        easter_days = EASTER_TABLE[years - EASTER_FIRST_YEAR]
+    else:
+        easter_days = easter_dates(years)
+    all_days, all_names = [], []
+    for rule, when, name in _COLOMBIA_RULES:
+        if rule.startswith("easter"):
+            days = easter_days + when
+        else:
+            month, day = when
+            days = (months + (month - 1)).astype("datetime64[D]") + (day - 1)
+        names = np.full(len(days), name, dtype=object)
+        if observed and rule == "weekday":
+            on_weekday = _weekdays(days) < SAT
+            days, names = days[on_weekday], names[on_weekday]
+        elif observed and rule.endswith("movable"):
+            weekdays = _weekdays(days)
+            moved = weekdays != MON
+            days = days + np.where(moved, (7 - weekdays) % 7, 0)
+            names[moved] = name + "(Observed)"
+        all_days.append(days)
+        all_names.append(names)
+
+    days = np.concatenate(all_days)
+    names = np.concatenate(all_names)
+    # A stable sort keeps holidays on the same date in _populate order, so
+    # their names merge the way HolidayBase.__setitem__ merges them.
+    order = np.argsort(days, kind="stable")
+    days, names = days[order], names[order]
+    first = np.ones(len(days), dtype=bool)
+    first[1:] = days[1:] != days[:-1]
+    if not first.all():
+        heads = np.maximum.accumulate(np.where(first, np.arange(len(days)), 0))
+        for i in np.flatnonzero(~first).tolist():
+            head = heads[i]
+            merged = _add_names(names[head], names[i])
+            if merged is not None:
+                names[head] = merged
+    return days[first], names[first].tolist()
+
 
 class CO(Colombia):
     pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Write the precomputed holiday data file."
+    )
+    parser.add_argument("path")
+    parser.add_argument(
+        "--first-year", type=int, default=os.environ.get("HOLIDAYS_FIRST_YEAR", 1900)
+    )
+    parser.add_argument(
+        "--last-year", type=int, default=os.environ.get("HOLIDAYS_LAST_YEAR", 2200)
+    )
+    parser.add_argument(
+        "--country", action="append", dest="countries", help="default: all"
+    )
+    args = parser.parse_args(argv)
+    write_data(args.path, args.first_year, args.last_year, args.countries)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,377 @@
+import gc
+import os
+import re
+import threading
+from collections import OrderedDict
 from datetime import date, timedelta
-from fastapi import FastAPI
+from enum import Enum
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
+import numpy
 from numpy import busday_count, busday_offset
 from starlette.middleware.cors import CORSMiddleware
-import holidays
+import calendars
 
 app = FastAPI()
 app.add_middleware(CORSMiddleware, allow_origins=["*"])
 
+# Every calendar and its default indexes are built at import, which under
+# gunicorn's --preload happens once before the workers fork.  Freezing the
+# collector afterwards keeps collections from writing to those objects and
+# unsharing the pages the workers inherited.
+calendars.preload()
+gc.freeze()
+
+
+def get_calendar(country, prov, observed):
+    try:
+        return calendars.get_calendar(country, prov, observed)
+    except KeyError as error:
+        raise HTTPException(status_code=404, detail=error.args[0])
+
+
+WEEKMASK = re.compile(r"[01]{7}\Z")
+
+
+def check_weekmask(weekmask):
+    # Working days as seven 0/1 characters, Monday first
+    if not WEEKMASK.match(weekmask) or "1" not in weekmask:
+        raise HTTPException(
+            status_code=422,
+            detail="weekmask must be seven 0/1 characters with at least one 1",
+        )
+
+
+class ResponseCache(object):
+    """Bounded LRU of serialized JSON response bodies.
+
+    Holds at most ``maxsize`` bodies of ``maxbytes`` bytes in total; bodies
+    larger than an eighth of ``maxbytes`` aren't cached, so one wide range
+    can't flush the rest.  Keys must include ``calendars.version()``, so
+    responses computed from replaced calendar data are never served; they
+    age out instead.
+    """
+
+    def __init__(self, maxsize, maxbytes=64 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._bodies.move_to_end(key)
+            return body
+
+    def put(self, key, content):
+        """Serialize ``content`` like FastAPI would, cache and return it."""
+        body = JSONResponse(jsonable_encoder(content)).body
+        if self.maxsize > 0 and len(body) <= self.maxbytes // 8:
+            with self._lock:
+                previous = self._bodies.pop(key, None)
+                if previous is not None:
+                    self.bytes -= len(previous)
+                self._bodies[key] = body
+                self.bytes += len(body)
+                while len(self._bodies) > self.maxsize or self.bytes > self.maxbytes:
+                    self.bytes -= len(self._bodies.popitem(last=False)[1])
+        return body
+
+    def info(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "size": len(self._bodies),
+            "maxsize": self.maxsize,
+            "bytes": self.bytes,
+            "maxbytes": self.maxbytes,
+        }
+
+
+# Per worker; 0 disables caching
+response_cache = ResponseCache(
+    int(os.environ.get("RESPONSE_CACHE_SIZE", 4096)),
+    int(os.environ.get("RESPONSE_CACHE_BYTES", 64 * 1024 * 1024)),
+)
+
+
+def json_response(body):
+    return Response(content=body, media_type="application/json")
+
+
+class Engine(str, Enum):
+    numpy = "numpy"
+    prefix = "prefix"
+    bitset = "bitset"  # analyze only; add-working-days uses numpy
+
+
+class AnalyzeBatch(BaseModel):
+    start_dates: List[date]
+    end_dates: List[date]
+    country: str = "CO"
+    prov: Optional[str] = None
+    observed: bool = True
+    weekmask: str = "1111100"
+
+
+class AddWorkingDaysBatch(BaseModel):
+    start_dates: List[date]
+    increments: List[int]
+    country: str = "CO"
+    prov: Optional[str] = None
+    observed: bool = True
+    weekmask: str = "1111100"
+
 
 @app.get("/api/analyze")
-async def analyze(start_date: date, end_date: date):
+async def analyze(
+    start_date: date,
+    end_date: date,
+    country: str = "CO",
+    prov: Optional[str] = None,
+    observed: bool = True,
+    weekmask: str = "1111100",
+    engine: Engine = Engine.numpy,
+):
+    check_weekmask(weekmask)
+    # Engines only differ in speed, so they share cached responses
+    key = (
+        "analyze",
+        calendars.version(),
+        start_date,
+        end_date,
+        country,
+        prov,
+        observed,
+        weekmask,
+    )
+    body = response_cache.get(key)
+    if body is None:
+        calendar = get_calendar(country, prov, observed)
+        body = response_cache.put(
+            key, _analyze(calendar, start_date, end_date, weekmask, engine)
+        )
+    return json_response(body)
+
+
+def _analyze(calendar, start_date, end_date, weekmask, engine):
     end_date = end_date + timedelta(days=1)  # include last day
     days = (end_date - start_date).days
-    colombia_holidays = holidays.CO()
-    holidays_range = colombia_holidays[start_date:end_date]
+    country_holidays = calendar.holidays(start_date, end_date)
+    holidays_range = country_holidays[start_date:end_date]
     public_holidays = {
-        holiday: colombia_holidays.get(holiday) for holiday in holidays_range
+        holiday: country_holidays.get(holiday) for holiday in holidays_range
     }
-    working_days = busday_count(start_date, end_date, holidays=holidays_range)
-    weekend_days = busday_count(start_date, end_date, weekmask="0000011")
+    working_days = weekend_days = None
+    if engine is Engine.prefix:
+        working_days = calendar.workday_index(weekmask).count(start_date, end_date)
+    elif engine is Engine.bitset:
+        bitset = calendar.bitset_index(weekmask)
+        working_days = bitset.count(start_date, end_date)
+        weekend_days = bitset.count_weekend(start_date, end_date)
+    if working_days is None:
+        working_days = busday_count(
+            start_date,
+            end_date,
+            busdaycal=calendar.busdaycal(start_date, end_date, weekmask),
+        ).item()
+    if weekend_days is None:
+        weekend_days = (
+            days
+            - busday_count(
+                start_date, end_date, busdaycal=calendars.weekmask_busdaycal(weekmask)
+            ).item()
+        )
     return {
         "days": days,
-        "working_days": working_days.item(),
-        "weekend_days": weekend_days.item(),
+        "working_days": working_days,
+        "weekend_days": weekend_days,
         "public_holidays": public_holidays,
     }
 
 
+@app.post("/api/analyze/batch")
+async def analyze_batch(batch: AnalyzeBatch):
+    if len(batch.start_dates) != len(batch.end_dates):
+        raise HTTPException(
+            status_code=422, detail="start_dates and end_dates differ in length"
+        )
+    check_weekmask(batch.weekmask)
+    calendar = get_calendar(batch.country, batch.prov, batch.observed)
+    if not batch.start_dates:
+        return {
+            "days": [],
+            "working_days": [],
+            "weekend_days": [],
+            "public_holidays": [],
+            "holiday_names": {},
+        }
+    start_dates = numpy.array(batch.start_dates, dtype="datetime64[D]")
+    end_dates = numpy.array(batch.end_dates, dtype="datetime64[D]") + 1
+    days = (end_dates - start_dates).astype(int)
+    first = min(start_dates.min(), end_dates.min()).item()
+    last = max(start_dates.max(), end_dates.max()).item()
+    working_days = busday_count(
+        start_dates,
+        end_dates,
+        busdaycal=calendar.busdaycal(first, last, batch.weekmask),
+    )
+    weekend_days = days - busday_count(
+        start_dates,
+        end_dates,
+        busdaycal=calendars.weekmask_busdaycal(batch.weekmask),
+    )
+
+    # Every range refers to the same sorted holiday list; like the single
+    # analyze endpoint, reversed ranges cover (end, start] in reverse order.
+    country_holidays = calendar.holidays(first, last)
+    holiday_dates = country_holidays[first : last + timedelta(days=1)]
+    holiday_array = numpy.array(holiday_dates, dtype="datetime64[D]")
+    reversed_ranges = end_dates < start_dates
+    lower = numpy.where(
+        reversed_ranges,
+        numpy.searchsorted(holiday_array, end_dates, side="right"),
+        numpy.searchsorted(holiday_array, start_dates, side="left"),
+    )
+    upper = numpy.where(
+        reversed_ranges,
+        numpy.searchsorted(holiday_array, start_dates, side="right"),
+        numpy.searchsorted(holiday_array, end_dates, side="left"),
+    )
+    public_holidays = []
+    for lo, hi, backwards in zip(
+        lower.tolist(), upper.tolist(), reversed_ranges.tolist()
+    ):
+        in_range = holiday_dates[lo:hi]
+        public_holidays.append(in_range[::-1] if backwards else in_range)
+    coverage = numpy.zeros(len(holiday_dates) + 1, dtype=int)
+    numpy.add.at(coverage, lower, 1)
+    numpy.add.at(coverage, upper, -1)
+    referenced = numpy.flatnonzero(numpy.cumsum(coverage[:-1]))
+    holiday_names = {
+        holiday_dates[i]: country_holidays.get(holiday_dates[i])
+        for i in referenced.tolist()
+    }
+    return {
+        "days": days.tolist(),
+        "working_days": working_days.tolist(),
+        "weekend_days": weekend_days.tolist(),
+        "public_holidays": public_holidays,
+        "holiday_names": holiday_names,
+    }
+
+
 @app.get("/api/add-working-days")
-async def add_working_days(start_date: date, increment: int):
-    end_date_without_holidays = busday_offset(
-        start_date, increment, roll="forward"
-    ).item()
-    co_holidays = holidays.CO()
-    holidays_range = co_holidays[start_date:end_date_without_holidays]
+async def add_working_days(
+    start_date: date,
+    increment: int,
+    country: str = "CO",
+    prov: Optional[str] = None,
+    observed: bool = True,
+    weekmask: str = "1111100",
+    engine: Engine = Engine.numpy,
+):
+    check_weekmask(weekmask)
+    key = (
+        "add-working-days",
+        calendars.version(),
+        start_date,
+        increment,
+        country,
+        prov,
+        observed,
+        weekmask,
+    )
+    body = response_cache.get(key)
+    if body is None:
+        calendar = get_calendar(country, prov, observed)
+        body = response_cache.put(
+            key, _add_working_days(calendar, start_date, increment, weekmask, engine)
+        )
+    return json_response(body)
+
+
+def _add_working_days(calendar, start_date, increment, weekmask, engine):
+    if engine is Engine.prefix:
+        end_date = calendar.workday_index(weekmask).offset(start_date, increment)
+        if end_date is not None:
+            return end_date
     end_date = busday_offset(
-        start_date, increment, holidays=holidays_range, roll="forward"
+        start_date,
+        increment,
+        roll="forward",
+        busdaycal=calendar.offset_busdaycal(
+            start_date, start_date, increment, increment, weekmask
+        ),
     )
     return end_date.item()
+
+
+@app.post("/api/add-working-days/batch")
+async def add_working_days_batch(batch: AddWorkingDaysBatch):
+    if len(batch.start_dates) != len(batch.increments):
+        raise HTTPException(
+            status_code=422, detail="start_dates and increments differ in length"
+        )
+    check_weekmask(batch.weekmask)
+    calendar = get_calendar(batch.country, batch.prov, batch.observed)
+    if not batch.start_dates:
+        return {"end_dates": []}
+    start_dates = numpy.array(batch.start_dates, dtype="datetime64[D]")
+    increments = numpy.array(batch.increments)
+    busdaycal = calendar.offset_busdaycal(
+        start_dates.min().item(),
+        start_dates.max().item(),
+        int(increments.min()),
+        int(increments.max()),
+        batch.weekmask,
+    )
+    end_dates = busday_offset(
+        start_dates, increments, roll="forward", busdaycal=busdaycal
+    )
+    return {"end_dates": end_dates.tolist()}
+
+
+@app.get("/api/memory")
+async def memory():
+    """Memory of the worker that serves the request, in bytes.
+
+    ``uss`` counts the pages only this process uses and ``pss`` splits the
+    shared ones between the processes sharing them, so comparing workers
+    shows how much of the preloaded state they still share.
+    """
+    try:
+        with open("/proc/self/smaps_rollup") as smaps:
+            lines = smaps.readlines()[1:]
+    except (IOError, OSError):
+        raise HTTPException(status_code=501, detail="smaps_rollup not available")
+    sizes = {}
+    for line in lines:
+        field, size = line.split()[:2]
+        sizes[field.rstrip(":")] = int(size) * 1024
+    return {
+        "pid": os.getpid(),
+        "rss": sizes["Rss"],
+        "pss": sizes["Pss"],
+        "uss": sizes["Private_Clean"] + sizes["Private_Dirty"],
+        "shared": sizes["Shared_Clean"] + sizes["Shared_Dirty"],
+    }
+
+
+@app.get("/api/cache")
+async def cache():
+    """Response cache counters of the worker that serves the request."""
+    return response_cache.info()
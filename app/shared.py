@@ -0,0 +1,167 @@
+"""Holiday data published in ``multiprocessing.shared_memory``.
+
+One process, the owner, encodes the data of ``holidays.encode_data`` into a
+named shared memory block once; every other process attaches to the block
+and reads the calendars as views of it with ``holidays.parse_data``, so
+gunicorn workers and process pools share a single copy of the arrays.
+
+A small control block named after the ``SharedCalendars`` holds a
+generation counter and the name of the current data block.  ``publish``
+writes new data into a fresh block and then bumps the generation; readers
+compare it with the generation they loaded and attach to the new block.
+The owner unlinks a block once it is replaced, and every process forgets
+it once it loads the next generation; the mapping itself lasts as long as
+calendars that are views of it.
+"""
+
+import os
+import struct
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import holidays
+
+CONTROL_MAGIC = b"HOLSHM01"
+# Magic, generation and name of the data block; the generation is written
+# before and after the name so readers can detect a concurrent publish.
+_CONTROL = struct.Struct("<8sQ64sQ")
+# Attempts ``load`` makes while a publish is in progress, and the first
+# delay between them, doubled after each attempt.
+LOAD_ATTEMPTS = 10
+LOAD_DELAY = 0.001
+
+
+class _Block(shared_memory.SharedMemory):
+    # Calendars are views of the block, which can't be closed while they
+    # exist, so it is never closed: the mapping is released with the last
+    # view of it.  The descriptor isn't needed once the block is mapped.
+    def __init__(self, *args, **kwargs):
+        shared_memory.SharedMemory.__init__(self, *args, **kwargs)
+        if getattr(self, "_fd", -1) >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def __del__(self):
+        pass
+
+
+_attach_lock = threading.Lock()
+
+
+def _attach(name):
+    # Attaching registers the block with the resource tracker, which would
+    # unlink it when this process exits although another process owns it
+    # (bpo-39959).  Unregistering afterwards isn't enough: processes forked
+    # from the owner share its tracker, so that drops the owner's entry.
+    if sys.version_info >= (3, 13):
+        return _Block(name=name, track=False)
+    with _attach_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return _Block(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedCalendars(object):
+    """Owner or reader of the holiday data blocks published as ``name``.
+
+    ``create`` makes the owner, which alone publishes and unlinks blocks;
+    only the process that created it unlinks them, so forked children that
+    inherit the owner can close it safely.  ``attach`` makes a reader.
+    """
+
+    def __init__(self, name, control, owner_pid=None):
+        self.name = name
+        self.owner_pid = owner_pid
+        self._control = control
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, name, data):
+        """Publish ``data`` as the first generation of a new ``name``.
+
+        Raises ``FileExistsError`` if another process already owns it.
+        """
+        control = _Block(name=name, create=True, size=_CONTROL.size)
+        shared = cls(name, control, owner_pid=os.getpid())
+        shared.publish(data)
+        return shared
+
+    @classmethod
+    def attach(cls, name):
+        """Attach to an existing ``name``; raises ``FileNotFoundError``."""
+        return cls(name, _attach(name))
+
+    @property
+    def owner(self):
+        return self.owner_pid == os.getpid()
+
+    def publish(self, data):
+        """Make ``data`` the current generation; only the owner can."""
+        if not self.owner:
+            raise RuntimeError("only the owner of %s can publish" % self.name)
+        with self._lock:
+            generation = self.generation() + 1
+            block_name = "%s-%d" % (self.name, generation)
+            block = _Block(name=block_name, create=True, size=len(data))
+            block.buf[: len(data)] = data
+            previous = self._blocks.pop(self.generation(), None)
+            self._blocks[generation] = block
+            _CONTROL.pack_into(
+                self._control.buf,
+                0,
+                CONTROL_MAGIC,
+                generation,
+                block_name.encode("ascii"),
+                generation,
+            )
+            if previous is not None:
+                previous.unlink()
+        return generation
+
+    def generation(self):
+        """Return the current generation, 0 before the first publish."""
+        magic, generation, _, _ = _CONTROL.unpack_from(self._control.buf)
+        return generation if magic == CONTROL_MAGIC else 0
+
+    def load(self):
+        """Return the current generation and its ``holidays.parse_data``.
+
+        Raises ``RuntimeError`` if none can be read in ``LOAD_ATTEMPTS``.
+        """
+        delay = LOAD_DELAY
+        for _ in range(LOAD_ATTEMPTS):
+            magic, generation, block_name, check = _CONTROL.unpack_from(
+                self._control.buf
+            )
+            if magic == CONTROL_MAGIC and generation == check:
+                block = self._blocks.get(generation)
+                if block is None:
+                    try:
+                        block = _attach(block_name.rstrip(b"\0").decode("ascii"))
+                    except FileNotFoundError:
+                        pass  # replaced before we could attach
+                    else:
+                        # Only the current generation is kept
+                        self._blocks = {generation: block}
+                if block is not None:
+                    return generation, holidays.parse_data(block.buf, block.name)
+            # A publish is in progress
+            time.sleep(delay)
+            delay *= 2
+        raise RuntimeError("cannot load the calendars published as %s" % self.name)
+
+    def close(self):
+        """Unlink the current block and the control block if this process
+        owns them."""
+        if self.owner:
+            block = self._blocks.get(self.generation())
+            if block is not None:
+                block.unlink()
+            self._control.unlink()
+            self.owner_pid = None
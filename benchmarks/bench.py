@@ -0,0 +1,402 @@
+"""Benchmarks for the HTTP endpoints and the holiday primitives.
+
+Run from the repository root::
+
+    pip install -r app/requirements.txt -r benchmarks/requirements.txt
+    python benchmarks/bench.py                      # everything
+    python benchmarks/bench.py -k analyze           # names containing "analyze"
+    python benchmarks/bench.py --save baseline.json
+    python benchmarks/bench.py --compare baseline.json
+
+Every benchmark reports the median time per call over several repeats;
+batch benchmarks also report items per second and ``memory/`` entries the
+size in bytes of an object and everything it references. ``--compare``
+prints the ratio against a file written by ``--save``, so a change can be
+measured against the tree it started from.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import timeit
+import warnings
+from datetime import date, timedelta
+
+import numpy
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+# The endpoint benchmarks repeat one request, so they measure the engines
+# with the response cache off; register_cache turns it on for its own.
+os.environ.setdefault("RESPONSE_CACHE_SIZE", "0")
+
+import calendars  # noqa: E402
+import holidays  # noqa: E402
+import main  # noqa: E402
+
+BENCHMARKS = []
+MEMORY = []
+
+START = date(1900, 1, 2)
+RANGES = [
+    ("week", 7),
+    ("month", 30),
+    ("year", 365),
+    ("decade", 3652),
+    ("century", 36524),
+    ("3-centuries", 109572),
+]
+INCREMENTS = [
+    ("week", 5),
+    ("month", 22),
+    ("year", 250),
+    ("decade", 2500),
+    ("century", 25000),
+    ("3-centuries", 75000),
+]
+BATCH_SIZE = 10000
+
+
+def benchmark(name, items=1):
+    """Register ``setup``; it returns the callable to time, built untimed."""
+
+    def register(setup):
+        BENCHMARKS.append((name, setup, items))
+        return setup
+
+    return register
+
+
+def memory(name):
+    """Register ``build``; it returns the object whose size is reported."""
+
+    def register(build):
+        MEMORY.append((name, build))
+        return build
+
+    return register
+
+
+def deep_size(obj, seen=None):
+    # Bytes used by ``obj`` and the objects it references, each counted once
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    if hasattr(obj, "__dict__"):
+        size += deep_size(obj.__dict__, seen)
+    if getattr(obj, "base", None) is not None:
+        size += deep_size(obj.base, seen)  # numpy views
+    for slot in getattr(type(obj), "__slots__", ()):
+        if hasattr(obj, slot):
+            size += deep_size(getattr(obj, slot), seen)
+    return size
+
+
+def call(coroutine):
+    # The endpoints never await, so they complete on the first send.
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("endpoint awaited")
+
+
+def client():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        from fastapi.testclient import TestClient
+    return TestClient(main.app)
+
+
+def register_endpoints():
+    for engine in main.Engine:
+        for label, days in RANGES:
+            end = START + timedelta(days=days - 1)
+            params = {"start_date": START, "end_date": end, "engine": engine.value}
+
+            @benchmark("analyze/http/%s/%s" % (engine.value, label))
+            def _(params=params):
+                http = client()
+                return lambda: http.get("/api/analyze", params=params)
+
+            @benchmark("analyze/direct/%s/%s" % (engine.value, label))
+            def _(end=end, engine=engine):
+                return lambda: call(main.analyze(START, end, engine=engine))
+
+        if engine is main.Engine.bitset:
+            continue  # add-working-days has no bitset path
+        for label, increment in INCREMENTS:
+            params = {
+                "start_date": START,
+                "increment": increment,
+                "engine": engine.value,
+            }
+
+            @benchmark("add-working-days/http/%s/%s" % (engine.value, label))
+            def _(params=params):
+                http = client()
+                return lambda: http.get("/api/add-working-days", params=params)
+
+            @benchmark("add-working-days/direct/%s/%s" % (engine.value, label))
+            def _(increment=increment, engine=engine):
+                return lambda: call(
+                    main.add_working_days(START, increment, engine=engine)
+                )
+
+
+def register_batches():
+    starts = [START + timedelta(days=(i * 37) % 100000) for i in range(BATCH_SIZE)]
+    ends = [start + timedelta(days=(i * 11) % 400) for i, start in enumerate(starts)]
+    increments = [(i * 13) % 500 - 100 for i in range(BATCH_SIZE)]
+
+    @benchmark("analyze-batch/http", items=BATCH_SIZE)
+    def _():
+        http = client()
+        body = {
+            "start_dates": [str(day) for day in starts],
+            "end_dates": [str(day) for day in ends],
+        }
+        return lambda: http.post("/api/analyze/batch", json=body)
+
+    @benchmark("analyze-batch/direct", items=BATCH_SIZE)
+    def _():
+        batch = main.AnalyzeBatch(start_dates=starts, end_dates=ends)
+        return lambda: call(main.analyze_batch(batch))
+
+    @benchmark("add-working-days-batch/http", items=BATCH_SIZE)
+    def _():
+        http = client()
+        body = {
+            "start_dates": [str(day) for day in starts],
+            "increments": increments,
+        }
+        return lambda: http.post("/api/add-working-days/batch", json=body)
+
+    @benchmark("add-working-days-batch/direct", items=BATCH_SIZE)
+    def _():
+        batch = main.AddWorkingDaysBatch(start_dates=starts, increments=increments)
+        return lambda: call(main.add_working_days_batch(batch))
+
+
+def register_holidays():
+    for years in (1, 10, 100):
+
+        @benchmark("holidays/construct/%d-years" % years)
+        def _(years=years):
+            return lambda: holidays.CO(years=range(2000, 2000 + years))
+
+    @benchmark("holidays/populate/1-year")
+    def _():
+        calendar = holidays.CO(expand=False)
+
+        def populate():
+            calendar.clear()
+            calendar._populate(2024)
+
+        return populate
+
+    @benchmark("holidays/setitem/new-date")
+    def _():
+        calendar = holidays.CO(years=[2024], expand=False)
+        day = date(2024, 2, 2)
+
+        def setitem():
+            calendar.pop(day, False)
+            calendar[day] = "Día de la Candelaria"
+
+        return setitem
+
+    @benchmark("holidays/setitem/merge")
+    def _():
+        calendar = holidays.CO(years=[2024], expand=False)
+        day = date(2024, 12, 25)
+        christmas = calendar[day]
+
+        def setitem():
+            del calendar[day]
+            calendar[day] = christmas
+            calendar[day] = "Nochebuena [Christmas Eve]"
+
+        return setitem
+
+    @benchmark("holidays/add/100-years")
+    def _():
+        observed = holidays.CO(years=range(2000, 2100))
+        unobserved = holidays.CO(years=range(2000, 2100), observed=False)
+        return lambda: observed + unobserved
+
+    calendar = holidays.CO(years=range(1900, 2201))
+
+    @benchmark("holidays/get_list")
+    def _():
+        return lambda: calendar.get_list(date(2000, 7, 3))
+
+    keys = [
+        ("date", date(2024, 12, 25)),
+        ("datetime", holidays.datetime(2024, 12, 25, 10, 30)),
+        ("int", 1735120800),
+        ("str", "2024-12-25"),
+    ]
+    for label, key in keys:
+
+        @benchmark("holidays/contains/%s" % label)
+        def _(key=key):
+            return lambda: key in calendar
+
+        @benchmark("holidays/keytransform/%s" % label)
+        def _(key=key):
+            return lambda: calendar.__keytransform__(key)
+
+    @benchmark("holidays/keytransform/str-distinct")
+    def _():
+        # More keys than the string cache holds, so every lookup parses
+        keys = [
+            "%04d-%02d-%02d" % (1900 + i % 300, i % 12 + 1, i % 28 + 1)
+            for i in range(10000)
+        ]
+
+        def transform():
+            for key in keys:
+                calendar.__keytransform__(key)
+
+        return transform
+
+    for label, days in RANGES:
+        end = START + timedelta(days=days)
+
+        @benchmark("holidays/slice/%s" % label)
+        def _(end=end):
+            return lambda: calendar[START:end]
+
+    @memory("memory/holidaybase/301-years")
+    def _():
+        return holidays.CO(years=range(1900, 2201))
+
+    @memory("memory/frozen/301-years")
+    def _():
+        return holidays.CO(years=range(1900, 2201)).freeze()
+
+
+def register_counts():
+    # Working days of a range without the endpoint around it
+    calendar = calendars.get_calendar("CO")
+
+    for label, days in RANGES:
+        end = START + timedelta(days=days)
+
+        @benchmark("count/busday_count/%s" % label)
+        def _(end=end):
+            busdaycal = calendar.busdaycal(START, end)
+            return lambda: numpy.busday_count(START, end, busdaycal=busdaycal)
+
+        @benchmark("count/prefix/%s" % label)
+        def _(end=end):
+            index = calendar.workday_index()
+            return lambda: index.count(START, end)
+
+        @benchmark("count/bitset/%s" % label)
+        def _(end=end):
+            index = calendar.bitset_index()
+            return lambda: index.count(START, end)
+
+    @memory("memory/busdaycalendar/301-years")
+    def _():
+        return calendar.busdaycal(START, START).holidays
+
+    @memory("memory/prefix/301-years")
+    def _():
+        return calendar.workday_index().counts
+
+    @memory("memory/bitset/301-years")
+    def _():
+        return calendar.bitset_index().working
+
+
+def register_cache():
+    for label, days in RANGES:
+        end = START + timedelta(days=days - 1)
+
+        @benchmark("analyze/direct/cached/%s" % label)
+        def _(end=end):
+            main.response_cache = main.ResponseCache(1024)
+            return lambda: call(main.analyze(START, end))
+
+    for label, increment in INCREMENTS:
+
+        @benchmark("add-working-days/direct/cached/%s" % label)
+        def _(increment=increment):
+            main.response_cache = main.ResponseCache(1024)
+            return lambda: call(main.add_working_days(START, increment))
+
+    @benchmark("analyze/http/cached/month")
+    def _():
+        main.response_cache = main.ResponseCache(1024)
+        http = client()
+        end = START + timedelta(days=29)
+        params = {"start_date": START, "end_date": end}
+        return lambda: http.get("/api/analyze", params=params)
+
+
+def measure(setup, repeat):
+    timer = timeit.Timer(setup())
+    number, _ = timer.autorange()
+    return statistics.median(
+        elapsed / number for elapsed in timer.repeat(repeat=repeat, number=number)
+    )
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", dest="pattern", default="", help="substring filter")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", help="write the results as JSON")
+    parser.add_argument("--compare", help="JSON results to compare against")
+    args = parser.parse_args()
+
+    register_endpoints()
+    register_batches()
+    register_holidays()
+    register_counts()
+    register_cache()
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as results:
+            baseline = json.load(results)
+
+    results = {}
+    for name, setup, items in BENCHMARKS:
+        if args.pattern not in name:
+            continue
+        seconds = results[name] = measure(setup, args.repeat)
+        line = "%-48s %12.2f us" % (name, seconds * 1e6)
+        if items > 1:
+            line += "  %12.0f items/s" % (items / seconds)
+        if name in baseline:
+            line += "  %6.2fx vs baseline" % (baseline[name] / seconds)
+        print(line)
+        sys.stdout.flush()
+
+    for name, build in MEMORY:
+        if args.pattern not in name:
+            continue
+        size = results[name] = deep_size(build())
+        line = "%-48s %12.1f KB" % (name, size / 1024.0)
+        if name in baseline:
+            line += "  %6.2fx vs baseline" % (baseline[name] / size)
+        print(line)
+
+    if args.save:
+        with open(args.save, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    run()
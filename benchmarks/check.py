@@ -0,0 +1,71 @@
+"""Checks that the vectorized holiday code agrees with the scalar code.
+
+Run from the repository root after changing a holiday rule::
+
+    python benchmarks/check.py
+
+Exits with status 1 and lists the first differences if any check fails.
+"""
+
+import os
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+
+import holidays  # noqa: E402
+
+YEARS = range(1, 10000)
+CHECKS = []
+
+
+def check(function):
+    CHECKS.append(function)
+    return function
+
+
+@check
+def colombia_bulk():
+    # colombia_holidays, used by Colombia._populate_many for 3 or more years,
+    # against Colombia._populate run year by year
+    differences = []
+    for observed in (True, False):
+        calendar = holidays.CO(expand=False, observed=observed)
+        for year in YEARS:
+            calendar._populate(year)
+        days, names = holidays.colombia_holidays(YEARS, observed=observed)
+        bulk = dict(zip(days.tolist(), names))
+        for day in sorted(set(calendar) | set(bulk)):
+            if calendar.get(day) != bulk.get(day):
+                differences.append(
+                    "observed=%s %s: %r != %r"
+                    % (observed, day, bulk.get(day), calendar.get(day))
+                )
+    return differences
+
+
+@check
+def easter_table():
+    # easter_dates and the table _easter looks up against dateutil
+    computed = holidays.easter_dates(list(YEARS)).tolist()
+    differences = []
+    for year, day in zip(YEARS, computed):
+        expected = holidays.easter(year)
+        if day != expected or holidays._easter(year) != expected:
+            differences.append("%d: %s != %s" % (year, day, expected))
+    return differences
+
+
+def run():
+    failed = False
+    for function in CHECKS:
+        differences = function()
+        print("%-24s %s" % (function.__name__, "FAIL" if differences else "ok"))
+        for difference in differences[:10]:
+            print("    " + difference)
+        failed = failed or bool(differences)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())